@@ -1,30 +1,65 @@
-from fastapi import FastAPI, HTTPException, Query, Response
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
+import hashlib
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import httpx
+import orjson
 import os
 from pydantic import BaseModel, create_model
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
     Integer,
     Float,
+    Index,
     Numeric,
     String,
     select,
     and_,
 )
+from sqlalchemy.ext.asyncio import create_async_engine
 from typing import Optional
+from starlette.background import BackgroundTask
 import uvicorn
 
-app = FastAPI()
 
-dev = False
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Share one client across tile requests so connections to MapTiler are kept alive
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=10.0,
+    )
+    yield
+    await app.state.http_client.aclose()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+if not DATABASE_URL:
+    raise RuntimeError("DATABASE_URL must be set to start the climate variables API")
+MAPTILER_API_KEY = os.getenv("MAPTILER_API_KEY", "")
+# Allow requests from any origin when developing locally
+dev = _env_flag("API_DEV")
+# Statement logging is expensive on small queries, so only enable it for development
+SQL_ECHO = _env_flag("SQL_ECHO")
+
 if dev:
     origins = ["*"]
 else:
-    origins = ["https://jackiepi.xyz", "https://www.jackiepi.xyz"]
+    origins = os.getenv(
+        "CORS_ORIGINS", "https://jackiepi.xyz,https://www.jackiepi.xyz"
+    ).split(",")
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,11 +69,39 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type"],
 )
 
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-DATABASE_URL = os.getenv("DATABASE_URL", "")
-MAPTILER_API_KEY = os.getenv("MAPTILER_API_KEY", "")
+# Tiles are addressed by z/x/y and climate data only changes when the database is
+# reseeded, so both can be cached by browsers and any proxies in front of the API.
+TILE_CACHE_CONTROL = "public, max-age=2592000, immutable"
+CLIMATE_CACHE_CONTROL = "public, max-age=3600"
+# Bump DATA_VERSION when the database is reseeded to invalidate cached responses
+DATA_VERSION = os.getenv("DATA_VERSION", "1")
+
+# Upper bound on the county_ids filter, a little above the number of US counties
+MAX_COUNTY_IDS = 3300
+
+# Serialized climate-variables responses and their ETags, keyed by the query that
+# produced them. The cache is bounded by the bytes of the bodies rather than the
+# number of entries, since county_ids lets clients request many distinct large ones.
+CLIMATE_CACHE_BYTES = int(os.getenv("CLIMATE_CACHE_BYTES", 128 * 1024 * 1024))
+climate_cache: TTLCache = TTLCache(
+    maxsize=CLIMATE_CACHE_BYTES, ttl=3600, getsizeof=lambda entry: len(entry[0])
+)
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Each uvicorn worker imports this module and opens its own pool, so DB_POOL_SIZE
+# connections are split between the WEB_CONCURRENCY workers. The defaults stay well
+# under Postgres's max_connections of 100, which martin also draws from.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 2))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 40))
+
+# Use the asyncpg driver so queries run on the event loop instead of the threadpool
+engine = create_async_engine(
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+    echo=SQL_ECHO,
+    pool_size=max(1, DB_POOL_SIZE // WEB_CONCURRENCY),
+    max_overflow=0,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
 metadata = MetaData()
 
 counties = Table(
@@ -55,7 +118,8 @@ climate_variables = Table(
     metadata,
     Column("id", Integer, primary_key=True),
     Column("county_id", Integer),
-    Column("gwl", Numeric(2, 1)),
+    # Return gwl as a float rather than a Decimal so it can be serialized by orjson
+    Column("gwl", Numeric(2, 1, asdecimal=False)),
     Column("pr_above_nonzero_99th", Float),
     Column("prmax1day", Float),
     Column("prmax5yr", Float),
@@ -71,6 +135,20 @@ climate_variables = Table(
     Column("tmin_jja", Float),
     Column("pr_annual", Float),
     Column("pr_days_above_nonzero_99th", Float),
+    # Mirrors the index created in database/init-db.sql for the county_id/gwl filter
+    Index("climate_vars_county_gwl_idx", "county_id", "gwl"),
+)
+
+# Absolute values (deltas applied to the 1991-2020 normals) are precomputed by this
+# materialized view, which also carries the county metadata. See database/init-db.sql.
+climate_variables_absolute = Table(
+    "climate_variables_absolute",
+    metadata,
+    *(Column(col.name, col.type) for col in climate_variables.columns),
+    Column("name", String),
+    Column("fips", String),
+    Column("state_abbr", String),
+    Index("climate_vars_abs_county_gwl_idx", "county_id", "gwl", unique=True),
 )
 
 climate_normals = Table(
@@ -87,9 +165,11 @@ climate_normals = Table(
     Column("pr_annual", Float),
 )
 
-VALID_COLUMNS = {col.name for col in climate_variables.columns}
+# Column names are quoted_name objects; store plain strings so they can be used as
+# model field names and serialized as keys by orjson.
+VALID_COLUMNS = {str(col.name) for col in climate_variables.columns}
 VALID_NORMALS = {
-    col.name for col in climate_normals.columns if col.name != "county_fips"
+    str(col.name) for col in climate_normals.columns if col.name != "county_fips"
 }
 
 
@@ -117,6 +197,69 @@ class ClimateData(BaseModel):
     state_abbr: Optional[str] = None
 
 
+class ClimateNormal(BaseModel):
+    county_fips: str
+    tavg: Optional[float] = None
+    tmax_days_ge_100f: Optional[float] = None
+    tmean_jja: Optional[float] = None
+    tmin_days_ge_70f: Optional[float] = None
+    tmin_days_le_0f: Optional[float] = None
+    tmin_days_le_32f: Optional[float] = None
+    tmin_jja: Optional[float] = None
+    pr_annual: Optional[float] = None
+
+
+def _climate_data_subset(var: str) -> type[BaseModel]:
+    """Create a model with required fields and the additional column named as `var`."""
+    model_fields = {
+        "id": (int, ...),
+        "county_id": (int, ...),
+        "gwl": (float, ...),
+        var: (Optional[float], None),
+        "name": (Optional[str], None),
+        "fips": (Optional[str], None),
+        "state_abbr": (Optional[str], None),
+    }
+    return create_model(f"ClimateDataSubset_{var}", **model_fields)
+
+
+# `var` is restricted to a fixed set of columns, so build each subset model once at
+# import time rather than compiling a new pydantic schema on every request.
+SUBSET_MODELS: dict[str, type[BaseModel]] = {
+    var: _climate_data_subset(var) for var in VALID_COLUMNS
+}
+NORMALS_SUBSET_MODELS: dict[str, type[BaseModel]] = {
+    var: create_model(
+        f"ClimateNormalSubset_{var}",
+        county_fips=(str, ...),
+        **{var: (Optional[float], None)},
+    )
+    for var in VALID_NORMALS
+}
+
+
+COUNTY_COLUMNS = (counties.c.name, counties.c.fips, counties.c.state_abbr)
+
+# Only the columns declared in ClimateData are selected, so the projection is pushed
+# down to the database rather than trimming rows after they are fetched.
+FULL_COLUMNS = (
+    tuple(
+        climate_variables.c[name]
+        for name in ClimateData.model_fields
+        if name in VALID_COLUMNS
+    )
+    + COUNTY_COLUMNS
+)
+ABSOLUTE_COUNTY_COLUMNS = (
+    climate_variables_absolute.c.name,
+    climate_variables_absolute.c.fips,
+    climate_variables_absolute.c.state_abbr,
+)
+FULL_ABSOLUTE_COLUMNS = tuple(
+    climate_variables_absolute.c[name] for name in ClimateData.model_fields
+)
+
+
 @app.get("/base_tiles/{z}/{x}/{y}.pbf")
 async def get_base_tile(z: int, x: int, y: int):
     """Reverse proxy for frontend to avoid leaking API key."""
@@ -124,24 +267,48 @@ async def get_base_tile(z: int, x: int, y: int):
         f"https://api.maptiler.com/tiles/v3-lite/{z}/{x}/{y}.pbf?key={MAPTILER_API_KEY}"
     )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(tile_url)
-            if response.status_code == 200:
-                return Response(
-                    content=response.content, media_type="application/x-protobuf"
-                )
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="Error fetching tile"
-                )
-        except httpx.RequestError:
-            raise HTTPException(status_code=500, detail="Server error fetching tile")
+    client: httpx.AsyncClient = app.state.http_client
+    try:
+        response = await client.send(client.build_request("GET", tile_url), stream=True)
+    except httpx.RequestError:
+        raise HTTPException(status_code=500, detail="Server error fetching tile")
+
+    if response.status_code != 200:
+        await response.aclose()
+        raise HTTPException(
+            status_code=response.status_code, detail="Error fetching tile"
+        )
+
+    # Stream the tile through to the client instead of buffering it in memory
+    return StreamingResponse(
+        response.aiter_bytes(),
+        media_type="application/x-protobuf",
+        headers={"Cache-Control": TILE_CACHE_CONTROL},
+        background=BackgroundTask(response.aclose),
+    )
+
+
+def _climate_response(
+    content: bytes, etag: str, if_none_match: Optional[str], cache_status: str
+) -> Response:
+    """Return a serialized climate response, or 304 if the client's copy matches."""
+    headers = {"Cache-Control": CLIMATE_CACHE_CONTROL, "ETag": etag}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers={**headers, "X-Cache": cache_status},
+    )
 
 
 @app.get("/climate-variables")
-def get_climate_variables(
+async def get_climate_variables(
     county_id: Optional[int] = Query(None, description="Filter by County ID"),
+    county_ids: Optional[str] = Query(
+        None,
+        description="Filter by a comma-separated list of County IDs, so that many counties can be fetched in one request",
+    ),
     gwl: Optional[float] = Query(None, description="Filter by Global Warming Level"),
     var: Optional[str] = Query(
         None,
@@ -151,116 +318,109 @@ def get_climate_variables(
         True,
         description="Display values as change from 1991-2020 normals, as opposed to absolute metrics. Default is True (values are deltas)",
     ),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Retrieve climate variables data.
 
     - If `var` is provided and is one of the valid columns, the response will only include
-      `id`, `county_id`, `gwl`, and the selected column.
+      `id`, `county_id`, `gwl`, the selected column, and the county's `name`, `fips`
+      and `state_abbr`.
     - Otherwise, all columns are returned.
+    - To color a map, prefer a single request filtered by `gwl` (and optionally
+      `county_ids`) over one request per county.
     """
-    # Build filters for the query
-    filters = []
-    if county_id is not None:
-        filters.append(climate_variables.c.county_id == county_id)
-    if gwl is not None:
-        filters.append(climate_variables.c.gwl == gwl)
-
-    # Build the join clause
+    ids: Optional[tuple[int, ...]] = None
+    if county_ids is not None:
+        try:
+            ids = tuple(sorted({int(i) for i in county_ids.split(",") if i.strip()}))
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="county_ids must be a list of integers"
+            )
+        if len(ids) > MAX_COUNTY_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"county_ids is limited to {MAX_COUNTY_IDS} values",
+            )
+
+    # Responses are cached by query and tagged with a hash of their body, so a
+    # client revalidating after the database is reseeded gets the new data.
+    cache_key = (DATA_VERSION, county_id, ids, gwl, var, relative)
+    cached = climate_cache.get(cache_key)
+    if cached is not None:
+        content, etag = cached
+        return _climate_response(content, etag, if_none_match, "HIT")
+
+    # Absolute values come from a materialized view that already includes the county
+    # columns, so only relative values need to be joined against counties.
     if relative:
+        table = climate_variables
         join_clause = climate_variables.join(
             counties, climate_variables.c.county_id == counties.c.id
         )
+        county_columns = COUNTY_COLUMNS
+        full_columns = FULL_COLUMNS
     else:
-        join_clause = climate_variables.join(
-            counties, climate_variables.c.county_id == counties.c.id
-        ).join(climate_normals, counties.c.fips == climate_normals.c.county_fips)
+        table = climate_variables_absolute
+        join_clause = climate_variables_absolute
+        county_columns = ABSOLUTE_COUNTY_COLUMNS
+        full_columns = FULL_ABSOLUTE_COLUMNS
 
-    # If a valid var is provided, select only a subset of columns.
+    # Build filters for the query
+    filters = []
+    if county_id is not None:
+        filters.append(table.c.county_id == county_id)
+    if ids is not None:
+        filters.append(table.c.county_id.in_(ids))
+    if gwl is not None:
+        filters.append(table.c.gwl == gwl)
+
+    # If a valid var is provided, select only that column plus the required columns.
     if var and var in VALID_COLUMNS:
-        if not relative and var in VALID_NORMALS:
-            if var == "pr_annual":
-                # pr_annual: normals (in inches) adjusted by percent change
-                var_column = (
-                    climate_normals.c.pr_annual
-                    * (1 + (climate_variables.c.pr_annual / 100.0))
-                ).label("pr_annual")
-            else:
-                var_column = (
-                    getattr(climate_variables.c, var) + getattr(climate_normals.c, var)
-                ).label(var)
-        else:
-            var_column = getattr(climate_variables.c, var)
-        columns_to_select = [
-            climate_variables.c.id,
-            climate_variables.c.county_id,
-            climate_variables.c.gwl,
-            var_column,
-            counties.c.name,
-            counties.c.fips,
-            counties.c.state_abbr,
-        ]
+        columns_to_select = (
+            table.c.id,
+            table.c.county_id,
+            table.c.gwl,
+            table.c[var],
+            *county_columns,
+        )
     else:
-        full_columns = []
-        for col in climate_variables.columns:
-            if not relative and col.name in VALID_NORMALS:
-                if col.name == "pr_annual":
-                    # Calculate pr_annual in inches using the normal and the percent change.
-                    full_columns.append(
-                        (
-                            climate_normals.c.pr_annual
-                            * (1 + (climate_variables.c.pr_annual / 100.0))
-                        ).label("pr_annual")
-                    )
-                else:
-                    full_columns.append(
-                        (col + getattr(climate_normals.c, col.name)).label(col.name)
-                    )
-            else:
-                full_columns.append(col)
-        columns_to_select = full_columns + [
-            counties.c.name,
-            counties.c.fips,
-            counties.c.state_abbr,
-        ]
+        columns_to_select = full_columns
 
     stmt = select(*columns_to_select).select_from(join_clause)
 
     if filters:
         stmt = stmt.where(and_(*filters))
 
-    with engine.connect() as conn:
-        results = conn.execute(stmt).fetchall()
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).mappings().all()
 
-    if not results:
+    if not rows:
         raise HTTPException(
             status_code=404, detail="No data found for the provided filters"
         )
 
-    # When var is provided, dynamically create a subset response model.
+    # When var is provided, use the matching subset response model.
     if var and var in VALID_COLUMNS:
-        # Create a model with required fields and the additional column named as `var`
-        model_fields = {
-            "id": (int, ...),
-            "county_id": (int, ...),
-            "gwl": (float, ...),
-            var: (Optional[float], None),
-            "name": (Optional[str], None),
-            "fips": (Optional[str], None),
-            "state_abbr": (Optional[str], None),
-        }
-        ClimateDataSubset = create_model("ClimateDataSubset", **model_fields)
-        # Convert each row into a dictionary and then into the dynamic model.
-        response = [ClimateDataSubset(**dict(row._mapping)) for row in results]
-        return response
+        ClimateDataSubset = SUBSET_MODELS[var]
+        # The rows are already typed by SQLAlchemy, so construct the models
+        # without running validation again.
+        response = [ClimateDataSubset.model_construct(**row) for row in rows]
     else:
         # Return the full data using the full model.
-        response = [ClimateData(**dict(row._mapping)) for row in results]
-        return response
+        response = [ClimateData.model_construct(**row) for row in rows]
+
+    # Serialize once with orjson and keep the bytes so repeat queries skip the database
+    content = orjson.dumps([row.model_dump() for row in response])
+    etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+    if len(content) <= CLIMATE_CACHE_BYTES:
+        climate_cache[cache_key] = (content, etag)
+    return _climate_response(content, etag, if_none_match, "MISS")
 
 
 @app.get("/climate-normals")
-def get_climate_normals(
+async def get_climate_normals(
     county_fips: Optional[str] = Query(None, description="Filter by County FIPS"),
     var: Optional[str] = Query(
         None,
@@ -271,7 +431,7 @@ def get_climate_normals(
     Retrieve climate normals data.
 
     - If `var` is provided and is one of the valid columns, the response will only include
-      `id`, `county_id`, `gwl`, and the selected column.
+      `county_fips` and the selected column.
     - Otherwise, all columns are returned.
     """
     # Build filters for the query
@@ -292,30 +452,32 @@ def get_climate_normals(
     if filters:
         stmt = stmt.where(and_(*filters))
 
-    with engine.connect() as conn:
-        results = conn.execute(stmt).fetchall()
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).mappings().all()
 
-    if not results:
+    if not rows:
         raise HTTPException(
             status_code=404, detail="No data found for the provided filters"
         )
 
-    # When var is provided, dynamically create a subset response model.
-    if var and var in VALID_COLUMNS:
-        # Create a model with required fields and the additional column named as `var`
-        ClimateNormalSubset = create_model(
-            "ClimateNormalSubset",
-            county_fips=(str, ...),
-            **{var: (Optional[float], None)},
-        )
-        # Convert each row into a dictionary and then into the dynamic model.
-        response = [ClimateNormalSubset(**dict(row._mapping)) for row in results]
-        return response
+    # Rows come straight from the typed climate_normals table, so they are
+    # constructed without re-validating each field.
+    if var and var in VALID_NORMALS:
+        model = NORMALS_SUBSET_MODELS[var]
     else:
-        # Return the full data using the full model.
-        response = [ClimateData(**dict(row._mapping)) for row in results]
-        return response
+        model = ClimateNormal
+    return [model.model_construct(**row) for row in rows]
 
 
 if __name__ == "__main__":
-    uvicorn.run("climate_vars:app", host="0.0.0.0", port=8000, reload=True)
+    if dev:
+        uvicorn.run("climate_vars:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        uvicorn.run(
+            "climate_vars:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=WEB_CONCURRENCY,
+            loop="uvloop",
+            http="httptools",
+        )
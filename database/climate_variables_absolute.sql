@@ -0,0 +1,37 @@
+-- Run by init-db.sql on a new database and by seed_normals.py on existing ones,
+-- so every statement here must be safe to repeat.
+
+-- Precompute absolute climate variables (deltas applied to the 1991-2020 normals)
+-- so the API does not need to join and recompute them on every request.
+-- Refreshed by the seed scripts whenever the source tables are loaded.
+CREATE MATERIALIZED VIEW IF NOT EXISTS climate_variables_absolute AS
+SELECT
+    cv.id,
+    cv.county_id,
+    cv.gwl,
+    cv.pr_above_nonzero_99th,
+    cv.prmax1day,
+    cv.prmax5yr,
+    cv.tavg + cn.tavg AS tavg,
+    cv.tmax1day,
+    cv.tmax_days_ge_100f + cn.tmax_days_ge_100f AS tmax_days_ge_100f,
+    cv.tmax_days_ge_105f,
+    cv.tmax_days_ge_95f,
+    cv.tmean_jja + cn.tmean_jja AS tmean_jja,
+    cv.tmin_days_ge_70f + cn.tmin_days_ge_70f AS tmin_days_ge_70f,
+    cv.tmin_days_le_0f + cn.tmin_days_le_0f AS tmin_days_le_0f,
+    cv.tmin_days_le_32f + cn.tmin_days_le_32f AS tmin_days_le_32f,
+    cv.tmin_jja + cn.tmin_jja AS tmin_jja,
+    -- pr_annual: normals (in inches) adjusted by percent change
+    cn.pr_annual * (1 + cv.pr_annual / 100.0) AS pr_annual,
+    cv.pr_days_above_nonzero_99th,
+    c.name,
+    c.fips,
+    c.state_abbr
+FROM climate_variables cv
+JOIN counties c ON c.id = cv.county_id
+JOIN climate_normals cn ON cn.county_fips = c.fips
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS climate_vars_abs_county_gwl_idx
+    ON climate_variables_absolute (county_id, gwl);
@@ -38,6 +38,22 @@ CREATE TABLE climate_variables (
     UNIQUE (county_id, gwl)
 );
 
+-- Create climate normals table (populated by seed_normals.py)
+CREATE TABLE climate_normals (
+    county_fips VARCHAR(5) PRIMARY KEY,
+    tavg NUMERIC,
+    tmax_days_ge_100f NUMERIC,
+    tmean_jja NUMERIC,
+    tmin_days_ge_70f NUMERIC,
+    tmin_days_le_0f NUMERIC,
+    tmin_days_le_32f NUMERIC,
+    tmin_jja NUMERIC,
+    pr_annual NUMERIC
+);
+
+-- Precompute absolute climate variables, see climate_variables_absolute.sql
+\i /usr/local/database/climate_variables_absolute.sql
+
 -- Create spatial index
 CREATE INDEX counties_geom_idx ON counties USING GIST (geom);
 
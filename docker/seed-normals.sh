@@ -6,5 +6,5 @@ until pg_isready; do
     sleep 1
 done
 
-/usr/local/bin/seed_normals.py /data/outputs/us_climate_normals_1991-2020.json
+/usr/local/bin/seed_normals.py /data/outputs/us_climate_normals_1991-2020.json \
     --dbname ar_climate_data --host localhost --user postgres --password ${POSTGRES_PASSWORD}
\ No newline at end of file
@@ -13,9 +13,11 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 """
 
 import argparse
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 
 # Maps columns names from NCA5 to the corresponding NOAA normals fields in this dataset
 # Fields with no direct mapping are marked with "--"
@@ -59,25 +61,116 @@ FIELD_MAP: dict[str, str] = {
 # Additional Information below)
 
 # Only data with C, S, or R flags are considered "good" data.
+GOOD_FLAGS = pa.array(["C", "S", "R"])
 
+READ_OPTIONS = pacsv.ReadOptions(use_threads=True, block_size=1 << 24)
 
-def analyze_csv(input_csv, sample_rows=None, sample_cols=None, output_plot=None):
+
+def _column_types(input_csv) -> dict[str, pa.DataType]:
+    """
+    Choose compact, explicit Arrow types for every column from the types inferred
+    on the first block of the CSV.
+
+    Numeric columns are parsed straight to float32. Flag columns, and columns that
+    are empty in the first block, are read as dictionary-encoded strings, which
+    stay small for a handful of distinct values and cannot fail to convert when a
+    later block holds values of a different type. Other text columns such as
+    STATION and NAME are left as strings.
+    """
+    schema = pacsv.open_csv(input_csv, read_options=READ_OPTIONS).schema
+    column_types = {}
+    for field in schema:
+        if "_flag_" in field.name or pa.types.is_null(field.type):
+            column_types[field.name] = pa.dictionary(pa.int32(), pa.string())
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            column_types[field.name] = pa.float32()
+    return column_types
+
+
+def analyze_csv(
+    input_csv, heatmap_rows=200, heatmap_cols=200, output_plot=None, heatmap=True
+):
     """
-    - Loads a large "wide" CSV (one row per station, many columns).
+    - Streams a large "wide" CSV (one row per station, many columns) in blocks.
     - Computes basic coverage stats for each column (how many non-null values).
-    - Optionally samples the DataFrame to a smaller subset of rows and columns.
-    - Plots a heatmap of missingness for quick visualization.
+    - Plots a heatmap of missingness, averaged over blocks of rows and columns so
+      that it is at most heatmap_rows x heatmap_cols cells, unless heatmap is False.
     - If output_plot is given, saves the figure to file (PNG); otherwise shows interactively.
     """
     print(f"Loading CSV: {input_csv}")
-    df = pd.read_csv(input_csv, low_memory=False)  # Attempt to reduce memory overhead
+    # PyArrow parses the CSV on multiple threads into typed columnar buffers, which
+    # is much faster and lighter than the pandas parser for very wide files. The
+    # file is streamed in blocks so that only one block and the column-reduced
+    # missingness counts are ever held in memory at once. The statistics are read
+    # straight off the Arrow columns, so blocks are never converted to pandas.
+    reader = pacsv.open_csv(
+        input_csv,
+        read_options=READ_OPTIONS,
+        # Match pandas, which treats empty string cells as missing
+        convert_options=pacsv.ConvertOptions(
+            column_types=_column_types(input_csv), strings_can_be_null=True
+        ),
+    )
+    # Resolve the completeness flag columns present in the file once, up front,
+    # rather than searching the schema for each of them in every block
+    flag_fields = [
+        noaa_col
+        for noaa_col in FIELD_MAP.values()
+        if noaa_col != "--" and f"comp_flag_{noaa_col}" in reader.schema.names
+    ]
+    flag_indices = [
+        reader.schema.get_field_index(f"comp_flag_{noaa_col}")
+        for noaa_col in flag_fields
+    ]
+
+    n_rows = 0
+    null_counts = np.zeros(len(reader.schema), dtype=np.int64)
+    good_counts = np.zeros(len(flag_indices), dtype=np.int64)
+    # Number of missing cells per row in each block of col_block columns. The last
+    # block holds whatever columns are left over.
+    col_block = None
+    missing_by_col_block = []
+    for batch in reader:
+        n_rows += batch.num_rows
+
+        # ---- COVERAGE STATS ----
+        # Count how many null entries each column has, Arrow arrays already
+        # track their own null count
+        null_counts += [col.null_count for col in batch.columns]
+        good_counts += np.array(
+            [
+                pc.sum(pc.is_in(batch.column(i), value_set=GOOD_FLAGS)).as_py() or 0
+                for i in flag_indices
+            ],
+            dtype=np.int64,
+        )
 
-    print(f"Data shape: {df.shape[0]} rows, {df.shape[1]} columns")
+        if not heatmap:
+            continue
+        if col_block is None:
+            # Ceiling division keeps the heatmap to at most heatmap_cols columns
+            col_block = max(1, -(-batch.num_columns // heatmap_cols))
+            n_col_blocks = -(-batch.num_columns // col_block)
+        # Add each column's nulls into its block rather than stacking a full
+        # rows x columns boolean mask; the cached null count lets columns that
+        # are fully present or fully missing skip the validity bitmap entirely.
+        missing = np.zeros((batch.num_rows, n_col_blocks), dtype=np.int32)
+        for i, col in enumerate(batch.columns):
+            if col.null_count == len(col):
+                missing[:, i // col_block] += 1
+            elif col.null_count:
+                missing[:, i // col_block] += col.is_null().to_numpy(
+                    zero_copy_only=False
+                )
+        missing_by_col_block.append(missing)
 
-    # ---- COVERAGE STATS ----
-    # Count how many non-null entries each column has
-    nonnull_counts = df.notnull().sum()  # For each column
-    coverage_pct = (nonnull_counts / len(df)) * 100  # Convert to percentage
+    if n_rows == 0:
+        raise ValueError(f"No rows found in {input_csv}")
+    nonnull_counts = pd.Series(n_rows - null_counts, index=reader.schema.names)
+
+    print(f"Data shape: {n_rows} rows, {len(nonnull_counts)} columns")
+
+    coverage_pct = (nonnull_counts / n_rows) * 100  # Convert to percentage
     coverage_stats = coverage_pct.sort_values(ascending=False)
 
     print("\nTop 10 columns by coverage (percentage of non-null entries):")
@@ -93,40 +186,58 @@ def analyze_csv(input_csv, sample_rows=None, sample_cols=None, output_plot=None)
 
     # Show coverage for mapped columns with completeness flags that are "good" data
     print("\nCoverage for columns with direct NOAA normals mapping and 'good' data:")
-    for nca5_col, noaa_col in FIELD_MAP.items():
-        if noaa_col != "--":
-            flag_col = f"comp_flag_{noaa_col}"
-            if flag_col in df:
-                good_data = df[flag_col].isin(["C", "S", "R"]).sum()
-                total_data = len(df)
-                good_pct = (good_data / total_data) * 100
-                print(f"{noaa_col}: {good_pct:.2f}%")
-
-    # If the dataset is huge, sampling can help us visualize
-    # (We don't necessarily want a 15k x 2k heatmap.)
-    df_sample = df
-    if sample_rows is not None and sample_rows < len(df_sample):
-        df_sample = df_sample.sample(n=sample_rows, random_state=42)
-
-    if sample_cols is not None and sample_cols < len(df_sample.columns):
-        df_sample = df_sample.sample(n=sample_cols, axis="columns", random_state=42)
+    good_pct = pd.Series(good_counts / n_rows * 100, index=flag_fields)
+    for noaa_col, pct in good_pct.items():
+        print(f"{noaa_col}: {pct:.2f}%")
+
+    if not heatmap:
+        return
 
     # ---- HEATMAP OF MISSINGNESS ----
-    print(f"\nGenerating heatmap on a sample of shape {df_sample.shape} ...")
-    sns.set(style="whitegrid", font_scale=0.8)
-
-    plt.figure(figsize=(12, 6))
-    # The heatmap: True for missing, False for present
-    # We'll display missingness as 1 (missing) or 0 (not missing)
-    sns.heatmap(
-        df_sample.isnull(),
-        cbar=False,
-        cmap=["#2e7d32", "#e53935"],  # green for not null, red for missing
+    # matplotlib is slow to import, so only pay for it when plotting
+    import matplotlib.pyplot as plt
+
+    # Average missingness over blocks of rows as well, since a 15k x 2k heatmap
+    # at one cell per value is slow to draw and aliases badly.
+    # The last block of rows (and of columns) may be partial, so each cell is
+    # divided by the number of values actually in it.
+    missing = np.concatenate(missing_by_col_block)
+    row_block = max(1, -(-n_rows // heatmap_rows))
+    row_starts = np.arange(0, n_rows, row_block)
+    rows_per_block = np.diff(np.append(row_starts, n_rows))
+    cols_per_block = np.diff(
+        np.append(np.arange(0, len(reader.schema), col_block), len(reader.schema))
+    )
+    coarse = np.add.reduceat(missing, row_starts, axis=0) / np.outer(
+        rows_per_block, cols_per_block
     )
-    plt.title("Missingness Heatmap (sampled)")
+
+    print(
+        f"\nGenerating heatmap of shape {coarse.shape} "
+        f"({row_block} rows x {col_block} columns per cell) ..."
+    )
+    fig, ax = plt.subplots(figsize=(12, 6))
+    # Each cell is the fraction of missing values in its block, from 0 (green,
+    # fully present) to 1 (red, fully missing). imshow draws the matrix as one
+    # rasterized image, where sns.heatmap would add a rectangle patch per cell.
+    im = ax.imshow(
+        coarse,
+        aspect="auto",
+        cmap="RdYlGn_r",
+        vmin=0,
+        vmax=1,
+        interpolation="nearest",
+        rasterized=True,
+    )
+    fig.colorbar(im, ax=ax, label="Fraction missing")
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_xlabel("Column blocks")
+    ax.set_ylabel("Station blocks")
+    ax.set_title("Missingness Heatmap (block averaged)")
 
     if output_plot:
-        plt.savefig(output_plot, dpi=150, bbox_inches="tight")
+        fig.savefig(output_plot, dpi=150, bbox_inches="tight")
         print(f"Heatmap saved to {output_plot}")
     else:
         plt.show()
@@ -138,29 +249,37 @@ def main():
     )
     parser.add_argument("input_csv", help="Path to the combined CSV file.")
     parser.add_argument(
+        "--heatmap-rows",
         "--sample-rows",
         type=int,
-        default=None,
-        help="Randomly sample this many rows for the heatmap (optional).",
+        default=200,
+        help="Average rows into at most this many heatmap rows (default: 200).",
     )
     parser.add_argument(
+        "--heatmap-cols",
         "--sample-cols",
         type=int,
-        default=None,
-        help="Randomly sample this many columns for the heatmap (optional).",
+        default=200,
+        help="Average columns into at most this many heatmap columns (default: 200).",
     )
     parser.add_argument(
         "--output-plot",
         default=None,
         help="If provided, save the heatmap to this file (e.g., 'heatmap.png').",
     )
+    parser.add_argument(
+        "--no-heatmap",
+        action="store_true",
+        help="Only print the coverage statistics, without building a heatmap.",
+    )
     args = parser.parse_args()
 
     analyze_csv(
         input_csv=args.input_csv,
-        sample_rows=args.sample_rows,
-        sample_cols=args.sample_cols,
+        heatmap_rows=args.heatmap_rows,
+        heatmap_cols=args.heatmap_cols,
         output_plot=args.output_plot,
+        heatmap=not args.no_heatmap,
     )
 
 
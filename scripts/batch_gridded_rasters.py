@@ -1,6 +1,9 @@
+import concurrent.futures
 import subprocess
 import os
 import sys
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 FIELD_MAP: dict[str, str] = {
     "pr_above_nonzero_99th": "--",
@@ -21,6 +24,27 @@ FIELD_MAP: dict[str, str] = {
 }
 
 
+def convert_to_parquet(input_csv: str) -> str:
+    """
+    Write a Parquet copy of the station CSV next to it, unless an up to date one
+    already exists, so each field's job reads only its columns instead of parsing
+    the whole wide CSV again.
+    """
+    parquet_path = os.path.splitext(input_csv)[0] + ".parquet"
+    if os.path.exists(parquet_path) and os.path.getmtime(
+        parquet_path
+    ) >= os.path.getmtime(input_csv):
+        return parquet_path
+
+    print(f"Converting {input_csv} to {parquet_path}")
+    table = pacsv.read_csv(
+        input_csv,
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True),
+    )
+    pq.write_table(table, parquet_path, compression="zstd")
+    return parquet_path
+
+
 def main():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     script_path = os.path.join(script_dir, "create_gridded_raster.py")
@@ -28,8 +52,10 @@ def main():
     output_dir = os.path.abspath(os.path.join(script_dir, "../data/outputs"))
 
     os.makedirs(output_dir, exist_ok=True)
+    input_parquet = convert_to_parquet(input_csv)
 
     component = "puerto_rico"
+    commands = []
     for json_field, csv_field in FIELD_MAP.items():
         if csv_field == "--":
             continue
@@ -37,25 +63,39 @@ def main():
         output_path = os.path.join(
             output_dir, f"{json_field}_{component}_grid_10km.tif"
         )
+        commands.append(
+            [
+                sys.executable,  # Use the current Python interpreter
+                script_path,
+                input_parquet,
+                output_path,
+                "-m",
+                csv_field,
+                "--resolution",
+                "10000",
+                "--component",
+                "PR",
+            ]
+        )
 
-        try:
-            subprocess.run(
-                [
-                    sys.executable,  # Use the current Python interpreter
-                    script_path,
-                    input_csv,
-                    output_path,
-                    "-m",
-                    csv_field,
-                    "--resolution",
-                    "10000",
-                    "--component",
-                    "PR",
-                ],
-                check=True,
-            )
-        except Exception as e:
-            print(f"Error executing {script_path}: {e}")
+    # Each field is kriged independently, so run one subprocess per core and pin
+    # each to a single BLAS thread to keep them from oversubscribing the CPU.
+    # Kriging memory grows with the square of the station count, lower
+    # BATCH_WORKERS if the machine runs out of RAM.
+    env = {**os.environ, "OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1"}
+    max_workers = int(
+        os.getenv("BATCH_WORKERS", min(len(commands), os.cpu_count() or 1))
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(subprocess.run, command, check=True, env=env)
+            for command in commands
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error executing {script_path}: {e}")
 
 
 if __name__ == "__main__":
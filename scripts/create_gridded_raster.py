@@ -12,17 +12,28 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 """
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+import hashlib
+import os
 from pathlib import Path
 import sys
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import numpy as np
 import rasterio
 from rasterio.transform import from_origin
 from pyproj import Transformer
 import geopandas as gpd
-from rasterio.features import geometry_mask
+from rasterio.features import rasterize
+import scipy.linalg
+from scipy.spatial.distance import cdist
 
 # Import the OrdinaryKriging class from PyKrige
+from pykrige.core import _adjust_for_anisotropy
 from pykrige.ok import OrdinaryKriging
 from pykrige.uk import UniversalKriging
 
@@ -37,7 +48,7 @@ def parse_arguments():
     parser.add_argument(
         "input",
         type=Path,
-        help="Path to input CSV file containing station data",
+        help="Path to input CSV or Parquet file containing station data",
     )
     parser.add_argument("output", type=Path, help="Path for output GeoTIFF file")
     parser.add_argument(
@@ -80,35 +91,87 @@ def parse_arguments():
         default="CONUS",
         help="Component of the data set to filter to.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes kriging bands of the grid concurrently (ordinary kriging only)",
+    )
+    parser.add_argument(
+        "--n_closest",
+        type=int,
+        default=64,
+        help="Krige each cell from only its N nearest stations, or 0 for all of them "
+        "(ordinary kriging only, universal kriging always uses all stations)",
+    )
     return parser.parse_args()
 
 
 def load_and_clean_data(input_file: Path, variable_name: str) -> pd.DataFrame:
     """
-    Load and clean station data from CSV file.
+    Load and clean station data from a CSV or Parquet file.
     """
-    df = pd.read_csv(input_file)
-
-    if f"comp_flag_{variable_name}" not in df.columns:
+    flag_col = f"comp_flag_{variable_name}"
+    parquet = Path(input_file).suffix == ".parquet"
+    # Check the header first so a missing flag column gets a clear error
+    if parquet:
+        columns = pq.read_schema(input_file).names
+    else:
+        columns = pd.read_csv(input_file, nrows=0).columns
+    if flag_col not in columns:
         raise ValueError(
             f"Expected a completeness flag column 'comp_flag_{variable_name}' "
-            f"but it was not found in the CSV. Check your data."
+            f"but it was not found in {input_file}. Check your data."
+        )
+
+    # The station data is very wide, only read the columns this measurement needs.
+    # Station values carry far fewer than 7 significant digits, and the flags are
+    # one of a handful of letters.
+    usecols = ["LONGITUDE", "LATITUDE", variable_name, flag_col]
+    flag_type = pa.dictionary(pa.int32(), pa.string())
+    if parquet:
+        table = pq.read_table(input_file, columns=usecols)
+        for name, type_ in ((variable_name, pa.float32()), (flag_col, flag_type)):
+            i = table.schema.get_field_index(name)
+            table = table.set_column(i, name, pc.cast(table[name], type_))
+    else:
+        table = pacsv.read_csv(
+            input_file,
+            convert_options=pacsv.ConvertOptions(
+                include_columns=usecols,
+                column_types={variable_name: pa.float32(), flag_col: flag_type},
+                strings_can_be_null=True,
+            ),
         )
 
-    # Filter out stations that don't record this measurement
-    df = df.dropna(subset=[variable_name])
-    # Only completeness flag values of (C)omplete, (S)tandard, or (R)epresentative should be used
-    df = df[df[f"comp_flag_{variable_name}"].isin(["C", "S", "R"])]
-    # Exclude the typical no-data value
-    df = df[df[variable_name] != 9999]
+    # Filter in Arrow before converting, so pandas only sees the kept stations.
+    # Stations that don't record this measurement are null and drop out, as do
+    # flags other than (C)omplete, (S)tandard, or (R)epresentative and the
+    # typical no-data value.
+    keep = pc.and_(
+        pc.is_in(table[flag_col], value_set=pa.array(["C", "S", "R"])),
+        pc.not_equal(table[variable_name], 9999),
+    )
+    df = table.filter(keep).to_pandas()
 
     print(f"Total stations after filtering flags: {len(df)}")
-    nstations_complete = df[f"comp_flag_{variable_name}"].value_counts().to_string()
+    nstations_complete = (
+        df[flag_col].cat.remove_unused_categories().value_counts().to_string()
+    )
     print(f"Stations by completeness flag:\n{nstations_complete}")
 
     return df
 
 
+@lru_cache(maxsize=None)
+def _wgs84_transformer(projection: str) -> Transformer:
+    """
+    Transformer from WGS84 longitude/latitude to the given projection. Building
+    one loads the PROJ database, so each is created once per process.
+    """
+    return Transformer.from_crs("EPSG:4326", projection, always_xy=True)
+
+
 def transform_coordinates(
     df: pd.DataFrame, projection: str, proj_bounds: tuple[int, int, int, int]
 ) -> tuple:
@@ -116,28 +179,32 @@ def transform_coordinates(
     Transform station coordinates from WGS84 to CONUS Albers (EPSG:5072) or a
     similar equal area projection for discontiguous portions of the US.
     """
-    transformer = Transformer.from_crs("EPSG:4326", projection, always_xy=True)
+    transformer = _wgs84_transformer(projection)
     lat_min, lon_min, lat_max, lon_max = proj_bounds
 
-    # Transform station coordinates
-    x_stations, y_stations = transformer.transform(
-        df["LONGITUDE"].values, df["LATITUDE"].values
-    )
+    # Transform station coordinates. pyproj works on contiguous float64 buffers,
+    # so hand it those directly rather than letting it copy the pandas columns.
+    lon = np.ascontiguousarray(df["LONGITUDE"].to_numpy(dtype=np.float64))
+    lat = np.ascontiguousarray(df["LATITUDE"].to_numpy(dtype=np.float64))
+    x_stations, y_stations = transformer.transform(lon, lat)
 
-    # Define the bounds in Albers projection (experimentally derived for CONUS)
-    x_min, y_min = transformer.transform(lon_min, lat_min)
-    x_max, y_max = transformer.transform(lon_max, lat_max)
+    # Define the bounds in Albers projection (experimentally derived for CONUS),
+    # transforming both corners in one call
+    (x_min, x_max), (y_min, y_max) = transformer.transform(
+        [lon_min, lon_max], [lat_min, lat_max]
+    )
 
     return x_stations, y_stations, x_min, x_max, y_min, y_max
 
 
 def create_grid(bounds: tuple, resolution: float) -> tuple:
     """
-    Creates a meshgrid of x, y coordinates in ascending order:
+    Creates the x, y grid axes in ascending order:
     - x: from x_min to x_max
     - y: from y_min to y_max
 
-    Returns (X_mesh, Y_mesh) arrays.
+    Returns (grid_x, grid_y) 1D arrays. PyKrige's "grid" mode takes the axes
+    directly, so no 2D meshgrid is built.
     """
     x_min, x_max, y_min, y_max = bounds
 
@@ -146,9 +213,7 @@ def create_grid(bounds: tuple, resolution: float) -> tuple:
     # y ascending from bottom (min) to top (max)
     grid_y = np.arange(y_min, y_max + resolution, resolution)
 
-    # Create 2D meshgrid
-    xx, yy = np.meshgrid(grid_x, grid_y)
-    return xx, yy
+    return grid_x, grid_y
 
 
 def filter_close_points(x, y, values, bounds, min_distance=1000):  # distance in meters
@@ -156,19 +221,15 @@ def filter_close_points(x, y, values, bounds, min_distance=1000):  # distance in
     in_bounds = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
     x, y, values = x[in_bounds], y[in_bounds], values[in_bounds]
 
-    points = np.column_stack((x, y))
-    filtered_indices = []
-    for i in range(len(points)):
-        if i in filtered_indices:
-            continue
-        distances = np.linalg.norm(points[i] - points, axis=1)
-        close_points = np.where(distances < min_distance)[0]
-        if len(close_points) > 1:  # if there are other points too close
-            # Keep only the first point from the cluster
-            filtered_indices.extend(close_points[1:])
-
-    mask = ~np.isin(np.arange(len(x)), filtered_indices)
-    return x[mask], y[mask], values[mask]
+    # Bucket stations into square cells of side min_distance and keep the first
+    # station in each cell. The call site passes the grid resolution, so this
+    # leaves at most one station per output pixel without any pairwise search.
+    ix = ((x - x_min) // min_distance).astype(np.int64)
+    iy = ((y - y_min) // min_distance).astype(np.int64)
+    keys = (ix << 32) | iy
+    _, keep = np.unique(keys, return_index=True)
+    keep.sort()
+    return x[keep], y[keep], values[keep]
 
 
 class KrigingInterpolator:
@@ -184,12 +245,20 @@ class KrigingInterpolator:
         nlags=20,  # Using 20 instead of default 6 for better variogram estimation
         weight=True,  # Enable distance-based variogram point weighting
         component="CONUS",
+        max_tile_cells=1 << 16,  # Grid cells kriged per PyKrige call
+        workers=1,  # Processes kriging bands concurrently (ordinary kriging)
+        n_closest_points=None,  # Local kriging from the nearest stations only
+        variogram_sample=2000,  # Stations used to fit the variogram
         **kwargs,
     ):
         self.method = method
         self.variogram_model = variogram_model
         self.nlags = nlags
         self.weight = weight
+        self.max_tile_cells = max_tile_cells
+        self.workers = workers
+        self.n_closest_points = n_closest_points
+        self.variogram_sample = variogram_sample
         self.kwargs = kwargs
         if component == "Alaska":
             self.dem_file = "data/ancillary/alaska_30as_dem.tif"
@@ -220,12 +289,12 @@ class KrigingInterpolator:
         Assumes that the input x and y coordinates are in the same
         coordinate system as the DEM (EPSG:5072).
         """
-        if self.dem_filepath is None:
+        if self.dem_file is None:
             raise ValueError(
                 "DEM filepath not provided for elevation drift calculation."
             )
         # Open the DEM and sample elevation at each (x, y)
-        with rasterio.open(self.dem_filepath) as src:
+        with rasterio.open(self.dem_file) as src:
             # Create a list of coordinate pairs
             coords = [(xi, yi) for xi, yi in zip(x, y)]
             # Sample returns a generator of tuples; extract the first band value for each point.
@@ -236,66 +305,220 @@ class KrigingInterpolator:
         )
         return elevations_norm
 
-    def interpolate(self, x, y, values, gridx, gridy):
+    def _build_kriger(self, x, y, values, **overrides):
         """
-        Perform kriging interpolation.
-        - gridx, gridy must be strictly ascending 1D arrays
-        - Returns interpolated 2D array z in shape (len(gridy), len(gridx))
+        Construct the PyKrige object for the configured method. Keyword
+        arguments override the interpolator's own settings.
         """
+        kwargs = {
+            "variogram_model": self.variogram_model,
+            "nlags": self.nlags,
+            "weight": self.weight,
+            **self.kwargs,
+            **overrides,
+        }
         if self.method == "ordinary":
-            krig = OrdinaryKriging(
-                x,
-                y,
-                values,
-                variogram_model=self.variogram_model,
-                nlags=self.nlags,
-                weight=self.weight,
-                **self.kwargs,
-            )
+            return OrdinaryKriging(x, y, values, **kwargs)
         elif self.method == "universal":
-            krig = UniversalKriging(
+            return UniversalKriging(
+                x, y, values, drift_terms=self.drift_terms, **kwargs
+            )
+        else:
+            raise ValueError(f"Interpolation method {self.method} not supported")
+
+    @staticmethod
+    def _ordinary_inverse(krig):
+        """
+        Return the inverse of krig's full ordinary kriging matrix.
+        """
+        return scipy.linalg.inv(krig._get_kriging_matrix(len(krig.Z)))
+
+    @staticmethod
+    def _ordinary_predictor(krig, a_inv=None):
+        """
+        Return a function kriging grid axes against every station with the
+        ordinary kriging system of krig, inverted once up front unless the
+        inverse a_inv is given. PyKrige's execute() inverts the full system
+        again on every call.
+        """
+        n = len(krig.Z)
+        if a_inv is None:
+            a_inv = KrigingInterpolator._ordinary_inverse(krig)
+        xy_data = np.column_stack((krig.X_ADJUSTED, krig.Y_ADJUSTED))
+
+        def predict(gridx, gridy):
+            xpts, ypts = np.meshgrid(gridx, gridy)
+            xy_points = _adjust_for_anisotropy(
+                np.column_stack((xpts.ravel(), ypts.ravel())),
+                [krig.XCENTER, krig.YCENTER],
+                [krig.anisotropy_scaling],
+                [krig.anisotropy_angle],
+            )
+            bd = cdist(xy_points, xy_data, "euclidean")
+            b = np.empty((len(bd), n + 1))
+            b[:, :n] = -krig.variogram_function(krig.variogram_model_parameters, bd)
+            if krig.exact_values:
+                b[:, :n][bd <= krig.eps] = 0.0
+            b[:, n] = 1.0
+            # One matrix product solves the system for every cell in the band
+            weights = b @ a_inv.T
+            zvalues = weights[:, :n] @ krig.Z
+            sigmasq = np.einsum("ij,ij->i", weights, -b)
+            return zvalues.reshape(xpts.shape), sigmasq.reshape(xpts.shape)
+
+        return predict
+
+    def _fit(self, x, y, values):
+        """
+        Construct the kriger for the stations, fitting its variogram.
+        """
+        # Fitting the variogram bins every pair of stations for each lag, which
+        # grows with the square of the station count, but the fit converges on a
+        # uniform subset. Fit there and give the parameters to the full kriger,
+        # which then only needs a single lag bin. Universal kriging (and ordinary
+        # kriging with statistics enabled) still runs its leave-one-out
+        # statistics over every station, which outweighs the fit, so a second
+        # kriger would only add time there.
+        if (
+            self.method == "ordinary"
+            and not self.kwargs.get("enable_statistics")
+            and self.variogram_sample
+            and len(values) > self.variogram_sample
+            and "variogram_parameters" not in self.kwargs
+        ):
+            rng = np.random.default_rng(42)
+            sample = rng.choice(len(values), self.variogram_sample, replace=False)
+            fitted = self._build_kriger(x[sample], y[sample], values[sample])
+            return self._build_kriger(
                 x,
                 y,
                 values,
-                variogram_model=self.variogram_model,
-                drift_terms=self.drift_terms,
-                nlags=self.nlags,
-                weight=self.weight,
-                **self.kwargs,
+                variogram_parameters=_variogram_parameters(fitted),
+                nlags=1,
             )
+        return self._build_kriger(x, y, values)
+
+    def _predictor(self, krig, a_inv=None):
+        """
+        Return a function kriging grid axes (gridx, gridy) with krig, using
+        a_inv as the inverse of its full ordinary kriging matrix if given.
+        """
+        # With n_closest_points each cell solves a small system over its nearest
+        # stations, found with a k-d tree, instead of the full n x n system.
+        # PyKrige only offers this moving window for ordinary kriging.
+        # Without it, ordinary kriging inverts the full system once and reuses it
+        # for every band. PyKrige's execute() re-inverts the kriging matrix on
+        # each call, so universal kriging bands should stay large.
+        if self.method == "ordinary" and self.n_closest_points:
+            return partial(
+                krig.execute,
+                "grid",
+                backend="C",
+                n_closest_points=self.n_closest_points,
+            )
+        elif self.method == "ordinary":
+            return self._ordinary_predictor(krig, a_inv)
         else:
-            raise ValueError(f"Interpolation method {self.method} not supported")
+            return partial(krig.execute, "grid")
 
-        # Execute kriging
-        z, ss = krig.execute("grid", gridx, gridy)
+    def interpolate(self, x, y, values, gridx, gridy):
+        """
+        Perform kriging interpolation.
+        - gridx, gridy must be strictly ascending 1D arrays
+        - Returns interpolated 2D array z in shape (len(gridy), len(gridx))
+        """
+        krig = self._fit(x, y, values)
+
+        # Execute kriging in bands of whole rows. PyKrige evaluates every cell of
+        # a call against every station at once, so its intermediates grow with
+        # cells x stations; banding bounds them by max_tile_cells x stations.
+        # PyKrige solves in float64 internally, but the bands are stored as
+        # float32 so clipping and writing work on half the bytes.
+        z = np.empty((len(gridy), len(gridx)), dtype=np.float32)
+        ss = np.empty_like(z)
+        band_rows = max(1, self.max_tile_cells // len(gridx))
+        starts = range(0, len(gridy), band_rows)
+        bands = [gridy[start : start + band_rows] for start in starts]
+
+        if self.workers > 1 and self.method == "ordinary":
+            # PyKrige's kriging loops hold the GIL, so bands are kriged in worker
+            # processes. Workers are sent the kriger built here, and for the full
+            # system its inverse as well, so neither is computed again per worker.
+            # Universal kriging re-inverts its system in every execute() call,
+            # which workers would only repeat, so it stays in this process.
+            a_inv = None if self.n_closest_points else self._ordinary_inverse(krig)
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_band_worker,
+                initargs=(self, krig, a_inv),
+            ) as executor:
+                results = executor.map(_krige_band, [gridx] * len(bands), bands)
+                for start, (z_band, ss_band) in zip(starts, results):
+                    rows = slice(start, start + band_rows)
+                    z[rows], ss[rows] = z_band, ss_band
+        else:
+            predict = self._predictor(krig)
+            for start, band in zip(starts, bands):
+                rows = slice(start, start + band_rows)
+                z[rows], ss[rows] = predict(gridx, band)
         return z, ss
 
 
+def _variogram_parameters(krig):
+    """
+    Return the fitted variogram of krig in a form PyKrige's constructors read
+    back unchanged. Fitted parameters are [psill, range, nugget] for the sill
+    models, but a list passed in is read as [sill, range, nugget].
+    """
+    params = list(krig.variogram_model_parameters)
+    if krig.variogram_model in ("gaussian", "spherical", "exponential", "hole-effect"):
+        return dict(zip(("psill", "range", "nugget"), params))
+    return params
+
+
+# Per-process kriging state for ProcessPoolExecutor workers
+_band_predict = None
+
+
+def _init_band_worker(interpolator, krig, a_inv):
+    global _band_predict
+    _band_predict = interpolator._predictor(krig, a_inv)
+
+
+def _krige_band(gridx, gridy):
+    z, ss = _band_predict(gridx, gridy)
+    return z.astype(np.float32), ss.astype(np.float32)
+
+
 def interpolate_measurement(
     points: np.ndarray,
     values: np.ndarray,
     grid_coords: tuple,
     method: str,
     variogram_model: str,
+    workers: int = 1,
+    n_closest: int | None = None,
 ) -> np.ndarray:
     """
     Interpolate values onto the grid using the specified kriging method.
 
-    grid_coords is assumed to be (X_mesh, Y_mesh) from create_grid()
-    where each is a 2D array. We'll extract unique x and y from them,
-    in ascending order, then flip the result so row=0 corresponds
+    grid_coords is assumed to be (grid_x, grid_y) from create_grid(), both
+    ascending 1D arrays. The result is flipped so row=0 corresponds
     to y_max (north-up).
     """
-    # Extract ascending 1D arrays
-    unique_x = np.unique(grid_coords[0])  # ascending x
-    unique_y = np.unique(grid_coords[1])  # ascending y
+    grid_x, grid_y = grid_coords
 
     x = points[:, 0]
     y = points[:, 1]
 
     # Instantiate the kriging interpolator.
-    krig = KrigingInterpolator(method=method, variogram_model=variogram_model)
-    z, ss = krig.interpolate(x, y, values, unique_x, unique_y)
+    krig = KrigingInterpolator(
+        method=method,
+        variogram_model=variogram_model,
+        workers=workers,
+        n_closest_points=n_closest,
+    )
+    z, ss = krig.interpolate(x, y, values, grid_x, grid_y)
 
     # PyKrige returns z with z[0, :] at the smallest y (i.e., y_min).
     # If we want row=0 to correspond to y_max for a north-up raster,
@@ -305,33 +528,70 @@ def interpolate_measurement(
     return z  # If you want the kriging variance, you could also return ss.
 
 
-def clip_to_component(
-    grid_data: np.ndarray,
-    transform: rasterio.transform.Affine,
+def _clip_mask(
     clip_file: str,
-    projection: str = "EPSG:5072",
+    shape: tuple[int, int],
+    transform: rasterio.transform.Affine,
+    projection: str,
 ) -> np.ndarray:
     """
-    Clip the grid data to the lower 48 boundary using the provided geopackage file.
-    Pixels outside the boundary are set to np.nan.
+    Rasterize the clip geometry to a boolean mask (True inside the boundary).
+
+    The mask only depends on the clip file and the grid, which are the same for
+    every measurement in a batch, so it is saved as a .npy next to the clip file
+    and reused by later runs until the clip file changes.
     """
+    key = hashlib.md5(repr((shape, tuple(transform), projection)).encode()).hexdigest()[
+        :12
+    ]
+    cache_file = Path(clip_file).with_suffix(f".mask_{key}.npy")
+    if (
+        cache_file.exists()
+        and cache_file.stat().st_mtime >= Path(clip_file).stat().st_mtime
+    ):
+        return np.load(cache_file)
+
     gdf = gpd.read_file(clip_file)
     # Ensure the clipping geometry is in EPSG:5072, or correct projection
     # for the component
     if gdf.crs != projection:
         gdf = gdf.to_crs(projection)
-    geoms = [geom for geom in gdf.geometry]
-
-    # Create a mask: with invert=True, pixels inside the geometries are True.
-    mask = geometry_mask(
-        geoms,
-        out_shape=grid_data.shape,
+    # Dissolve the boundary into a single geometry so it is burned in one pass
+    boundary = gdf.geometry.union_all()
+
+    # Burn the boundary straight into a uint8 array: pixels inside it are 1.
+    # A 0/1 uint8 array reinterprets as bool without a copy.
+    mask = rasterize(
+        [(boundary, 1)],
+        out_shape=shape,
         transform=transform,
         all_touched=True,
-        invert=True,
-    )
-    clipped_data = np.where(mask, grid_data, np.nan)
-    return clipped_data
+        dtype="uint8",
+    ).view(bool)
+
+    # Batch jobs run concurrently, so write to a temporary file and rename it
+    # into place to avoid another job reading a partial mask.
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "wb") as f:
+        np.save(f, mask)
+    os.replace(tmp_file, cache_file)
+    return mask
+
+
+def clip_to_component(
+    grid_data: np.ndarray,
+    transform: rasterio.transform.Affine,
+    clip_file: str,
+    projection: str = "EPSG:5072",
+) -> np.ndarray:
+    """
+    Clip the grid data to the lower 48 boundary using the provided geopackage file.
+    Pixels outside the boundary are set to np.nan in place, and grid_data is
+    returned.
+    """
+    mask = _clip_mask(clip_file, grid_data.shape, transform, projection)
+    grid_data[~mask] = np.nan
+    return grid_data
 
 
 def write_geotiff(
@@ -356,6 +616,13 @@ def write_geotiff(
     elif projection == "EPSG:3991":
         desc = "Puerto Rico (EPSG:4139)"
 
+    # Large rasters are tiled so windowed reads stay block aligned. Small ones
+    # would mostly be tile padding, so they keep the default strips.
+    if grid_data.size > 1_000_000:
+        layout = {"tiled": True, "blockxsize": 512, "blockysize": 512}
+    else:
+        layout = {}
+
     with rasterio.open(
         output_file,
         "w",
@@ -367,6 +634,13 @@ def write_geotiff(
         crs=projection,
         transform=transform,
         nodata=np.nan,
+        # DEFLATE compressed with the floating point predictor, which suits
+        # smooth climate fields
+        compress="DEFLATE",
+        predictor=3,
+        zlevel=4,
+        BIGTIFF="IF_SAFER",
+        **layout,
     ) as dst:
         dst.write(grid_data, 1)
         # You can store any custom tags you like
@@ -388,6 +662,8 @@ def create_measurement_grid(
     interp_method: str = "ordinary",
     variogram_model: str = "spherical",
     component: str = "CONUS",
+    workers: int = 1,
+    n_closest: int | None = 64,
 ):
     """
     Create a gridded raster of a given measurement from weather station data using kriging.
@@ -417,43 +693,53 @@ def create_measurement_grid(
         df, proj, proj_bounds
     )
     proj_bounds_transformed = (x_min, x_max, y_min, y_max)
+    # Each stage below only needs the previous stage's arrays, so intermediates
+    # are released as soon as they are consumed to keep peak memory down while
+    # kriging builds its system and output grid.
+    station_values = df[variable_name].to_numpy()
+    del df
 
     x_filtered, y_filtered, values_filtered = filter_close_points(
         x_stations,
         y_stations,
-        df[variable_name].values,
+        station_values,
         proj_bounds_transformed,
         min_distance=resolution,
     )
+    del x_stations, y_stations, station_values
     print(f"Filtered on bbox down to {len(values_filtered)} points")
 
-    # Create grid (2D mesh in ascending order for x and y)
-    grid_x_mesh, grid_y_mesh = create_grid((x_min, x_max, y_min, y_max), resolution)
+    # Create grid (1D axes in ascending order for x and y)
+    grid_x, grid_y = create_grid((x_min, x_max, y_min, y_max), resolution)
 
     # Prepare coordinates and values for interpolation
     points = np.column_stack((x_filtered, y_filtered))
     values = values_filtered
+    del x_filtered, y_filtered, values_filtered
 
     # Perform interpolation using ordinary kriging
     grid_temp = interpolate_measurement(
         points,
         values,
-        (grid_x_mesh, grid_y_mesh),
+        (grid_x, grid_y),
         method=interp_method,
         variogram_model=variogram_model,
+        workers=workers,
+        n_closest=n_closest,
     )
+    del points, values
 
     # Create an affine transform consistent with top-left = (x_min, y_max)
     # Since we flipped the data after kriging, row=0 corresponds to y_max.
     transform_affine = from_origin(x_min, y_max, resolution, resolution)
 
     # Clip the grid to the boundary specified in the clip file
-    grid_temp_clipped = clip_to_component(
+    grid_temp = clip_to_component(
         grid_temp, transform_affine, clip_file, projection=proj
     )
 
     # Write the clipped grid to GeoTIFF
-    write_geotiff(output_file, grid_temp_clipped, transform_affine, projection=proj)
+    write_geotiff(output_file, grid_temp, transform_affine, projection=proj)
 
     print(f"Successfully created gridded raster of {variable_name}: {output_file}")
 
@@ -469,6 +755,8 @@ def main():
         interp_method=args.interp_method,
         variogram_model=args.variogram_model,
         component=args.component,
+        workers=args.workers,
+        n_closest=args.n_closest,
     )
 
 
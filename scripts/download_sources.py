@@ -13,62 +13,115 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 """Download data sources for NCA counties database."""
 import argparse
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore import UNSIGNED
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
 from pathlib import Path
-import requests
 import tarfile
 
 
 def download_noaa_normals(src_dir: Path) -> None:
-    URL = "https://noaa-normals-pds.s3.amazonaws.com/normals-annualseasonal/1991-2020/archive/us-climate-normals_1991-2020_v1.0.1_annualseasonal_multivariate_by-station_c20230404.tar.gz"
-    FILENAME = URL.split("/")[-1]
+    # https://noaa-normals-pds.s3.amazonaws.com/<KEY>, a public bucket
+    BUCKET = "noaa-normals-pds"
+    KEY = "normals-annualseasonal/1991-2020/archive/us-climate-normals_1991-2020_v1.0.1_annualseasonal_multivariate_by-station_c20230404.tar.gz"
+    FILENAME = KEY.split("/")[-1]
 
     src_dir.mkdir(parents=True, exist_ok=True)
 
-    filepath = src_dir / FILENAME
+    # Marks a finished extraction, the archive itself is no longer written to
+    # disk (but earlier runs left it behind, so it counts too)
+    sentinel = src_dir / f".{FILENAME}.extracted"
 
     # Only download if it hasn't been done already to avoid excess egress costs for NOAA
     # 1991-2020 climate normals do not change over time
-    if filepath.exists():
-        print(f"File {FILENAME} already exists in {src_dir}")
+    if sentinel.exists() or (src_dir / FILENAME).exists():
+        print(f"File {FILENAME} already extracted in {src_dir}")
         return
 
-    print(f"Downloading {FILENAME}...")
-    response = requests.get(URL, stream=True)
-    response.raise_for_status()
+    print(f"Downloading and extracting {FILENAME}...")
+    # A single HTTP stream can't saturate the link, so fetch the archive as
+    # concurrent ranged GETs. boto3 reassembles the parts in order into a pipe,
+    # and the archive is decompressed from the other end as it arrives rather
+    # than saved and read back.
+    s3 = boto3.client("s3", config=Config(signature_version=UNSIGNED))
+    transfer_config = TransferConfig(multipart_chunksize=16 << 20, max_concurrency=8)
+    read_fd, write_fd = os.pipe()
+
+    def fetch() -> None:
+        with open(write_fd, "wb") as writer:
+            s3.download_fileobj(BUCKET, KEY, writer, Config=transfer_config)
+
+    with ThreadPoolExecutor(max_workers=1) as executor, open(read_fd, "rb") as reader:
+        future = executor.submit(fetch)
+        try:
+            # Read the stream in 1 MiB blocks, tarfile defaults to 10 KiB
+            with tarfile.open(fileobj=reader, mode="r|gz", bufsize=1 << 20) as tar:
+                tar.extractall(path=src_dir)
+        except tarfile.TarError as err:
+            # A failed download ends the stream early, report why. Closing the
+            # reader first makes a download that is still running fail with
+            # EPIPE rather than block on a full pipe, so waiting on it is safe.
+            reader.close()
+            error = future.exception()
+            if error is not None and not isinstance(error, BrokenPipeError):
+                raise error from err
+            raise
+        # Drain anything after the end-of-archive marker so the download finishes
+        while reader.read(1 << 20):
+            pass
+        future.result()
+    sentinel.touch()
 
-    with open(filepath, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    print("Download and extraction complete")
 
-    print(f"Extracting {FILENAME}...")
-    with tarfile.open(filepath, "r:gz") as tar:
-        tar.extractall(path=src_dir)
 
-    print("Download and extraction complete")
+def etag_file(localpath: Path) -> Path:
+    """Sidecar holding the S3 ETag of a synced file."""
+    return localpath.with_name(localpath.name + ".etag")
 
 
 def sync_s3_bucket(src_dir: Path) -> None:
-    s3 = boto3.client("s3")
+    # Every download thread, and the transfer threads each one starts for large
+    # objects, needs its own connection. botocore pools only 10 by default.
+    s3 = boto3.client("s3", config=Config(max_pool_connections=64))
     bucket = "ar-db25"
     prefix = "ar-parent/nca-atlas/"
 
     src_dir.mkdir(parents=True, exist_ok=True)
 
-    # Sync the bucket key to the sources directory
+    def download(key: str, localpath: Path, etag: str) -> None:
+        s3.download_file(bucket, key, str(localpath))
+        etag_file(localpath).write_text(etag)
+
+    # Sync the bucket key to the sources directory. Each download is a blocking
+    # round trip, so list everything first and fetch the stale files concurrently
+    # (boto3 clients are thread safe).
     paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if key.endswith("/"):  # Skip directories
-                continue
-
-            localpath = src_dir / Path(key).relative_to(prefix)
-            localpath.parent.mkdir(parents=True, exist_ok=True)
-
-            if not localpath.exists() or obj["Size"] != localpath.stat().st_size:
-                print(f"Downloading {key}...")
-                localpath.parent.mkdir(parents=True, exist_ok=True)
-                s3.download_file(bucket, key, str(localpath))
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if key.endswith("/"):  # Skip directories
+                    continue
+
+                localpath = src_dir / Path(key).relative_to(prefix)
+
+                # The ETag recorded at download time changes with the object's
+                # content, even when its size does not
+                etag = obj["ETag"]
+                if (
+                    not localpath.exists()
+                    or not etag_file(localpath).exists()
+                    or etag_file(localpath).read_text() != etag
+                ):
+                    print(f"Downloading {key}...")
+                    localpath.parent.mkdir(parents=True, exist_ok=True)
+                    futures.append(executor.submit(download, key, localpath, etag))
+        for future in as_completed(futures):
+            future.result()
 
 
 def main() -> None:
@@ -13,12 +13,43 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
+# Station files are tiny, so parse each on the calling thread. Empty fields are
+# missing values in text columns too, as pandas treats them.
+READ_KWARGS = {
+    "read_options": pacsv.ReadOptions(use_threads=False),
+    "convert_options": pacsv.ConvertOptions(strings_can_be_null=True),
+}
 
-def combine_csv_as_wide_table(folder: Path, output_csv: Path, recursive=False):
+
+def _read_station(csv_file: Path) -> pa.Table | None:
+    """
+    Read the data row of one station CSV as a one-row table, or None if the
+    file can't be used.
+    """
+    try:
+        table = pacsv.read_csv(csv_file, **READ_KWARGS)
+    except (pa.ArrowInvalid, OSError) as e:
+        print(f"Skipping file {csv_file}, error reading CSV: {e}")
+        return None
+
+    if table.num_rows == 0:
+        print(f"Warning: {csv_file} is empty or has no data row. Skipping.")
+        return None
+
+    # We assume there's exactly 1 data row
+    return table.slice(0, 1)
+
+
+def combine_csv_as_wide_table(
+    folder: Path, output_csv: Path, recursive=False, jobs=32, output_format="csv"
+):
     """
     Scans all CSV files in 'folder' (optionally recursively).
     Each CSV is assumed to have:
@@ -26,6 +57,9 @@ def combine_csv_as_wide_table(folder: Path, output_csv: Path, recursive=False):
        - Exactly 1 data row
        - The first column = 'STATION' with a unique station ID
     We merge them into a single "wide" CSV file, writing to 'output_csv'.
+    'jobs' files are read concurrently. With output_format "parquet" or
+    "feather" the table is written in that format instead, with the matching
+    suffix on 'output_csv'.
     """
 
     # Gather CSV files
@@ -36,46 +70,41 @@ def combine_csv_as_wide_table(folder: Path, output_csv: Path, recursive=False):
         print(f"No CSV files found in '{folder}'. Exiting.")
         return
 
-    # We will build a list of dictionaries. Each dict = one station's row of data.
-    records = []
-
-    for csv_file in csv_files:
-        try:
-            # Read just 1 row into a DataFrame
-            df = pd.read_csv(
-                csv_file, nrows=1
-            )  # By default, header=0 -> first row is header
-        except Exception as e:
-            print(f"Skipping file {csv_file}, error reading CSV: {e}")
-            continue
-
-        if df.empty:
-            print(f"Warning: {csv_file} is empty or has no data row. Skipping.")
-            continue
+    # Parse each file with Arrow's native CSV reader and keep its first row as a
+    # one-row table, rather than building a pandas DataFrame per station. Each
+    # file is tiny, so the time goes to opening and reading it; threads overlap
+    # that latency, and Arrow releases the GIL while parsing.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        tables = [t for t in executor.map(_read_station, csv_files) if t is not None]
 
-        # We assume there's exactly 1 data row, so just convert that row to a dictionary
-        row_dict = df.iloc[0].to_dict()
-
-        # Optionally, we can store the file path or filename if needed
-        # row_dict['source_file'] = csv_file.name
-
-        # Append to our records
-        records.append(row_dict)
-
-    if not records:
+    if not tables:
         print("No usable records found.")
         return
 
-    # Convert our list of dictionaries to a big DataFrame
-    # Missing columns will become NaN automatically
-    wide_df = pd.DataFrame(records)
+    # Concatenate into one big table in a single pass. Columns are unioned by
+    # name, so missing columns become null, and numeric types are widened where
+    # stations disagree (e.g. int vs float).
+    try:
+        wide_df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    except pa.ArrowTypeError:
+        # A column holds text in some files and numbers in others, which Arrow
+        # won't merge. Let pandas build object columns instead.
+        wide_df = pd.DataFrame([table.to_pylist()[0] for table in tables])
 
     # Ensure 'STATION' is the first column (and is unique)
     if "STATION" in wide_df.columns:
         wide_df.set_index("STATION", inplace=True)  # Makes STATION the row index
 
-    # Write out to CSV
-    wide_df.to_csv(output_csv, index=bool("STATION" not in wide_df.columns))
+    # Write out to CSV, or a columnar binary format that skips formatting every
+    # float as text and re-reads much faster
+    if output_format == "parquet":
+        output_csv = output_csv.with_suffix(".parquet")
+        wide_df.to_parquet(output_csv, compression="zstd")
+    elif output_format == "feather":
+        output_csv = output_csv.with_suffix(".feather")
+        wide_df.reset_index().to_feather(output_csv, compression="zstd")
+    else:
+        wide_df.to_csv(output_csv, index=bool("STATION" not in wide_df.columns))
     print(f"Combined table written to '{output_csv}'.")
     print(f"Total records: {len(wide_df)}")
     print(f"Total columns: {len(wide_df.columns)}")
@@ -90,6 +119,18 @@ def main():
     parser.add_argument(
         "--recursive", action="store_true", help="Search subfolders recursively."
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=32,
+        help="Number of files to read concurrently (default: 32).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet", "feather"],
+        default="csv",
+        help="Output file format (default: csv).",
+    )
     args = parser.parse_args()
 
     folder_path = Path(args.folder)
@@ -99,7 +140,13 @@ def main():
 
     output_csv = Path(args.output)
 
-    combine_csv_as_wide_table(folder_path, output_csv, recursive=args.recursive)
+    combine_csv_as_wide_table(
+        folder_path,
+        output_csv,
+        recursive=args.recursive,
+        jobs=args.jobs,
+        output_format=args.format,
+    )
 
 
 if __name__ == "__main__":
@@ -1,28 +1,39 @@
 #!/usr/bin/env python3
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
 import geopandas as gpd
-import json
+import numpy as np
+import orjson
 import rasterio
 from rasterio.warp import transform_bounds
-from rasterstats import zonal_stats
+from rasterio.features import rasterize
+from rasterio.windows import Window
 import pandas as pd
 import os
-from shapely.geometry import shape
+from pathlib import Path
+import shapely
 
 
 def get_county_geometries(gwl_file: str) -> gpd.GeoDataFrame:
     """
     Retrieve county geometries from a GWL JSON file.
 
+    The parsed counties are cached as GeoParquet next to the JSON file and read
+    from there until the JSON file changes.
+
     Args:
         gwl_file: json file
 
     Returns:
         GeoDataFrame containing county geometries and metadata
     """
+    cache = Path(gwl_file).with_suffix(".parquet")
+    if cache.exists() and cache.stat().st_mtime >= os.stat(gwl_file).st_mtime:
+        return gpd.read_parquet(cache)
+
     # Load the first file to get county geometries and metadata
-    with open(gwl_file, "r") as f:
-        data = json.load(f)
+    with open(gwl_file, "rb") as f:
+        data = orjson.loads(f.read())
 
     # Insert counties first
     counties_data = [
@@ -31,26 +42,69 @@ def get_county_geometries(gwl_file: str) -> gpd.GeoDataFrame:
             feature["properties"]["STATE_NAME"],
             feature["properties"]["STATE_ABBR"],
             feature["properties"]["FIPS"],
-            json.dumps(feature["geometry"]),
+            orjson.dumps(feature["geometry"]),
         )
         for feature in data["features"]
     ]
     cols = ["NAME", "STATE_NAME", "STATE_ABBR", "FIPS", "geometry_json"]
     df = pd.DataFrame(counties_data, columns=cols)
 
-    # Step 2: Parse geometry from the JSON string
-    df["geometry"] = df["geometry_json"].apply(lambda g: shape(json.loads(g)))
-
-    # Step 3: Convert to a GeoDataFrame in EPSG:4326
-    gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+    # Step 2: Parse every geometry from its JSON string in one GEOS call
+    geometry = shapely.from_geojson(df["geometry_json"].to_numpy())
 
-    # Optionally, drop the original geometry_json column
-    gdf.drop(columns="geometry_json", inplace=True)
+    # Step 3: Convert to a GeoDataFrame in EPSG:4326, dropping the original
+    # geometry_json column
+    gdf = gpd.GeoDataFrame(
+        df.drop(columns="geometry_json"), geometry=geometry, crs="EPSG:4326"
+    )
+    gdf.to_parquet(cache)
     return gdf
 
 
+# Raster pixels reduced per windowed read in process_raster
+BAND_PIXELS = 1 << 22
+
+
+def county_labels(
+    counties: gpd.GeoDataFrame,
+    shape: tuple[int, int],
+    transform: rasterio.Affine,
+) -> np.ndarray:
+    """
+    Burn every county into one label image, county i as label i + 1.
+
+    Pixels touched by several counties take one label, so the smallest counties
+    are burned last to keep them from losing all of their pixels to a neighbour.
+
+    Args:
+        counties: GeoDataFrame containing county geometries in the raster's CRS
+        shape: (rows, columns) of the raster
+        transform: Affine transform of the raster
+
+    Returns:
+        int32 array of county labels, 0 outside every county
+    """
+    geometry = counties.geometry.to_numpy()
+    order = np.argsort(-shapely.area(geometry))
+    return rasterize(
+        (
+            (geometry[i], i + 1)
+            for i in order
+            if geometry[i] is not None and not geometry[i].is_empty
+        ),
+        out_shape=shape,
+        transform=transform,
+        fill=0,
+        all_touched=True,  # Include every pixel the county touches
+        dtype="int32",
+    )
+
+
 def process_raster(
-    raster_path: str, counties: gpd.GeoDataFrame, var_name: str
+    raster_path: str,
+    counties: gpd.GeoDataFrame,
+    var_name: str,
+    labels: np.ndarray | None = None,
 ) -> pd.DataFrame:
     """
     Calculate zonal statistics for each county from the input raster.
@@ -59,28 +113,44 @@ def process_raster(
         raster_path: Path to the input raster file
         counties: GeoDataFrame containing county geometries
         var_name: Name of the climate variable being processed
+        labels: county_labels() of the counties on this raster's grid, if
+            already computed
 
     Returns:
         DataFrame containing county IDs and their average values
     """
     try:
         with rasterio.open(raster_path) as src:
-            # Ensure geometries are in same CRS as raster
-            counties_proj = counties.to_crs(src.crs)
-
-            # Calculate zonal statistics
-            stats = zonal_stats(
-                counties_proj.geometry,
-                raster_path,
-                stats=["mean"],
-                nodata=src.nodata,
-                all_touched=True,  # Only include pixels with centroids within polygon
-            )
+            if labels is None:
+                # Ensure geometries are in same CRS as raster
+                counties_proj = counties.to_crs(src.crs)
+                labels = county_labels(counties_proj, src.shape, src.transform)
+
+            # Reduce the raster per county label with bincount, one pass over
+            # the pixels instead of a mask per county. The raster is read in
+            # bands of whole rows, so the float64 copy and masks of the values
+            # never cover more than BAND_PIXELS at once.
+            n = len(counties) + 1
+            sums = np.zeros(n)
+            counts = np.zeros(n, dtype=np.int64)
+            band_rows = max(1, BAND_PIXELS // src.width)
+            for row in range(0, src.height, band_rows):
+                window = Window(0, row, src.width, min(band_rows, src.height - row))
+                data = src.read(1, window=window, masked=True)
+                data = data.astype("float64").filled(np.nan)
+                band_labels = labels[row : row + window.height]
+
+                valid = (band_labels > 0) & np.isfinite(data)
+                sums += np.bincount(
+                    band_labels[valid], weights=data[valid], minlength=n
+                )
+                counts += np.bincount(band_labels[valid], minlength=n)
+            # Counties without any valid pixels get NaN
+            with np.errstate(invalid="ignore"):
+                means = sums[1:] / counts[1:]
 
             # Create results dataframe
-            results = pd.DataFrame(
-                {"county_id": counties.FIPS, var_name: [s["mean"] for s in stats]}
-            )
+            results = pd.DataFrame({"county_id": counties.FIPS, var_name: means})
 
             print(f"Processed {var_name} raster for {len(results)} counties")
             return results
@@ -90,6 +160,47 @@ def process_raster(
         raise
 
 
+def split_regions(counties: gpd.GeoDataFrame) -> list[gpd.GeoDataFrame]:
+    """
+    Split the counties by the regional raster that covers them.
+
+    Args:
+        counties: GeoDataFrame containing county geometries
+
+    Returns:
+        GeoDataFrames of the counties in CONUS, Alaska, Hawaii and Puerto Rico,
+        in the order of each variable's raster files
+    """
+    # The state is the first two digits of the county FIPS code. As a categorical
+    # over the non-CONUS states, its codes are 0-2 for those and -1 for CONUS,
+    # so every region is one integer comparison.
+    state = pd.Categorical(counties["FIPS"].str[:2], categories=["02", "15", "72"])
+    return [counties[state.codes == ndx - 1] for ndx in range(4)]
+
+
+# Counties of each regional raster, set once in each worker process
+_regions: list[gpd.GeoDataFrame] = []
+# County label images by region and raster grid. Every variable's raster for a
+# region shares one grid, so each worker reprojects and rasterizes a region once.
+_labels: dict[tuple, np.ndarray] = {}
+
+
+def _init_worker(counties: gpd.GeoDataFrame) -> None:
+    global _regions
+    _regions = split_regions(counties)
+
+
+def _process_region(var_name: str, raster_path: str, ndx: int) -> pd.DataFrame:
+    counties = _regions[ndx]
+    with rasterio.open(raster_path) as src:
+        key = (ndx, src.crs.to_string(), tuple(src.transform), src.shape)
+        if key not in _labels:
+            _labels[key] = county_labels(
+                counties.to_crs(src.crs), src.shape, src.transform
+            )
+    return process_raster(raster_path, counties, var_name, labels=_labels[key])
+
+
 def main() -> None:
     """
     Main function to process climate normals for all variables.
@@ -124,71 +235,60 @@ def main() -> None:
         # Get county geometries
         counties = get_county_geometries(gwl_file)
 
-        # Process each raster and collect results
-        all_results = []
+        # Every (variable, region) raster is independent and rasterizing holds
+        # the GIL, so process them in parallel worker processes. The counties
+        # are sent to each worker once.
+        tasks = []
         for var_name, raster_file_set in raster_files.items():
-            results = []
             for ndx, raster_file in enumerate(raster_file_set):
                 raster_path = os.path.join(raster_dir, raster_file)
                 if not os.path.exists(raster_path):
                     print(f"Raster file not found: {raster_path}")
                     continue
+                tasks.append((var_name, raster_path, ndx))
+        if not tasks:
+            raise FileNotFoundError(f"No rasters found in {raster_dir}")
 
-                if ndx == 0:
-                    results.append(
-                        process_raster(
-                            raster_path,
-                            counties[~counties["FIPS"].isin(["02", "15", "72"])],
-                            var_name,
-                        )
-                    )
-                elif ndx == 1:
-                    results.append(
-                        process_raster(
-                            raster_path,
-                            counties[counties["FIPS"].isin(["02"])],
-                            var_name,
-                        )
-                    )
-                elif ndx == 2:
-                    results.append(
-                        process_raster(
-                            raster_path,
-                            counties[counties["FIPS"].isin(["15"])],
-                            var_name,
-                        )
-                    )
-                elif ndx == 3:
-                    results.append(
-                        process_raster(
-                            raster_path,
-                            counties[counties["FIPS"].isin(["72"])],
-                            var_name,
-                        )
-                    )
-                merged_results = pd.concat(results, ignore_index=True)
-            all_results.append(merged_results)
-
-        # Merge all results
-        raw_results = all_results[0]
-        for df in all_results[1:]:
-            raw_results = raw_results.merge(df, on="county_id")
+        with ProcessPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, len(tasks)),
+            initializer=_init_worker,
+            initargs=(counties,),
+        ) as executor:
+            task_results = list(executor.map(_process_region, *zip(*tasks)))
+
+        # Stack the regions of each variable, in the order of the variables
+        results: dict[str, list[pd.DataFrame]] = {}
+        for (var_name, _, _), result in zip(tasks, task_results):
+            results.setdefault(var_name, []).append(result)
+        all_results = [
+            pd.concat(var_results, ignore_index=True).set_index("county_id")
+            for var_results in results.values()
+        ]
+
+        # Merge all results, aligning the variables on their county_id index in
+        # one pass. An inner join keeps only counties every variable covers.
+        raw_results = pd.concat(all_results, axis=1, join="inner").reset_index()
 
         counties_gdf = raw_results
 
-        if "tmin_days_le_0f" in counties_gdf.columns:
-            counties_gdf.loc[counties_gdf["tmin_days_le_0f"] < 0, "tmin_days_le_0f"] = 0
-        if "tmin_days_le_32f" in counties_gdf.columns:
-            counties_gdf.loc[
-                counties_gdf["tmin_days_le_32f"] < 0, "tmin_days_le_32f"
-            ] = 0
+        # Clamp negative day counts to 0 with a single ufunc pass per column
+        # rather than building a boolean mask and assigning through it
+        for col in ("tmin_days_le_0f", "tmin_days_le_32f"):
+            if col in counties_gdf.columns:
+                counties_gdf[col] = np.clip(counties_gdf[col].to_numpy(), 0, None)
 
         # Invert the values in tmin_days_ge_70f: replace with 365.25 - current_value
         if "tmin_days_ge_70f" in counties_gdf.columns:
-            counties_gdf["tmin_days_ge_70f"] = 365.25 - counties_gdf["tmin_days_ge_70f"]
+            counties_gdf["tmin_days_ge_70f"] = np.subtract(
+                365.25, counties_gdf["tmin_days_ge_70f"].to_numpy()
+            )
 
         output_json = "data/outputs/us_climate_normals_1991-2020.json"
-        counties_gdf.to_json(output_json, orient="records", indent=4)
+        # orjson writes the records compactly in native code; NaN becomes null
+        # as it did with to_json
+        Path(output_json).write_bytes(
+            orjson.dumps(counties_gdf.to_dict(orient="records"))
+        )
         print(f"Exported final results to {output_json}")
 
     except Exception as e:
@@ -11,118 +11,200 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 import argparse
-import json
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import gzip
+import io
+import os
+from typing import BinaryIO, Dict, Iterator, Tuple
+import ijson
+import orjson
 import psycopg2
-from psycopg2.extras import execute_values
 from psycopg2.extensions import connection as PostgresConnection
+import shapely
+
+# Columns of counties loaded from the first GWL file
+COUNTY_COLUMNS = ("name", "state_name", "state_abbr", "fips", "geom")
+
+# Columns of climate_variables, in the order of the rows loaded from a GWL file
+CLIMATE_COLUMNS = (
+    "county_id",
+    "gwl",
+    "pr_above_nonzero_99th",
+    "prmax1day",
+    "prmax5yr",
+    "tavg",
+    "tmax1day",
+    "tmax_days_ge_100f",
+    "tmax_days_ge_105f",
+    "tmax_days_ge_95f",
+    "tmean_jja",
+    "tmin_days_ge_70f",
+    "tmin_days_le_0f",
+    "tmin_days_le_32f",
+    "tmin_jja",
+    "pr_annual",
+    "pr_days_above_nonzero_99th",
+)
+
+# Columns of the rows loaded from a GWL file, which carry the county FIPS code
+# until they are joined to counties on the server
+STAGE_COLUMNS = ("fips",) + CLIMATE_COLUMNS[1:]
+
+
+def open_source(path: str) -> BinaryIO:
+    """
+    Open a GeoJSON file for reading, decompressing it as it is read if it ends
+    in .gz or .zst (which needs the zstandard package).
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        import zstandard
 
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    return open(path, "rb")
 
-def load_geojson_data(
-    connection: PostgresConnection, gwl_files: Dict[str, float]
-) -> None:
-    cursor = connection.cursor()
 
-    # Load the first file to get county geometries and metadata
-    with open(next(iter(gwl_files)), "r") as f:
-        data = json.load(f)
-
-    # Insert counties first
-    counties_data: List[Tuple[str, str, str, str, str]] = [
-        (
-            feature["properties"]["NAME"],
-            feature["properties"]["STATE_NAME"],
-            feature["properties"]["STATE_ABBR"],
-            feature["properties"]["FIPS"],
-            json.dumps(feature["geometry"]),
-        )
-        for feature in data["features"]
-    ]
+def iter_features(path: str) -> Iterator[dict]:
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time, so a file
+    is never held in memory as a whole.
+    """
+    with open_source(path) as f:
+        yield from ijson.items(f, "features.item", use_float=True)
 
-    cursor.execute(
-        """
-        CREATE TEMP TABLE temp_counties (
-            name VARCHAR(255),
-            state_name VARCHAR(255),
-            state_abbr CHAR(2),
-            fips VARCHAR(5),
-            geom_json JSON
-        )
+
+def format_row(row: Tuple) -> str:
     """
-    )
+    Format a row as a line of COPY text, tab-separated with None as NULL.
+    """
+    return "\t".join("\\N" if v is None else str(v) for v in row) + "\n"
 
-    execute_values(
-        cursor,
-        """
-        INSERT INTO temp_counties (name, state_name, state_abbr, fips, geom_json)
-        VALUES %s
-    """,
-        counties_data,
-    )
 
-    # Insert into final counties table with proper geometry
-    cursor.execute(
-        """
-        INSERT INTO counties (name, state_name, state_abbr, fips, geom)
-        SELECT 
-            name, 
-            state_name, 
-            state_abbr, 
-            fips,
-            ST_SetSRID(ST_GeomFromGeoJSON(geom_json::text), 4326)
-        FROM temp_counties
-        RETURNING id, fips
+def copy_text(cursor, table: str, columns: Tuple[str, ...], text: str) -> None:
+    """
+    Load rows formatted by format_row() into a table with COPY, which skips
+    encoding and parsing every value as an INSERT parameter.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)"
+    cursor.copy_expert(sql, io.StringIO(text))
+
+
+def parse_gwl_file(
+    gwl_file: str, gwl_value: float, counties: bool = False
+) -> Tuple[str, str]:
     """
+    Read the climate variables of every county from one GWL file, and with
+    counties=True the counties themselves, in a single pass over the file.
+
+    County geometries are converted to hex EWKB, which PostGIS reads straight
+    into the geom column, so the server never parses GeoJSON. They are converted
+    together in vectorized GEOS calls rather than one shapely object at a time.
+
+    Returns:
+        Climate rows in STAGE_COLUMNS order and county rows in COUNTY_COLUMNS
+        order (empty unless counties=True), each formatted for COPY
+    """
+    # The property names of this GWL, built once rather than for every feature
+    gwl = int(gwl_value)
+    keys = tuple(f"{column}_GWL{gwl}" for column in CLIMATE_COLUMNS[2:])
+
+    climate_data = io.StringIO()
+    counties_data = []
+    geometries = []
+    for feature in iter_features(gwl_file):
+        if not (props := feature["properties"]):
+            continue
+        climate_data.write(
+            format_row((props["FIPS"], gwl_value, *map(props.get, keys)))
+        )
+        if counties:
+            counties_data.append(
+                (
+                    props["NAME"],
+                    props["STATE_NAME"],
+                    props["STATE_ABBR"],
+                    props["FIPS"],
+                )
+            )
+            geometries.append(orjson.dumps(feature["geometry"]))
+
+    geoms = shapely.set_srid(shapely.from_geojson(geometries), 4326)
+    ewkb = shapely.to_wkb(geoms, hex=True, include_srid=True)
+    counties_text = "".join(
+        format_row((*county, geom)) for county, geom in zip(counties_data, ewkb)
     )
+    return climate_data.getvalue(), counties_text
+
 
-    # Get FIPS to county_id mapping
-    fips_to_id = {fips: id for id, fips in cursor.fetchall()}
+def load_geojson_data(
+    connection: PostgresConnection, gwl_files: Dict[str, float]
+) -> None:
+    cursor = connection.cursor()
 
-    # Now load climate variables for each GWL
-    for gwl_file, gwl_value in gwl_files.items():
-        with open(gwl_file, "r") as f:
-            data = json.load(f)
+    # Climate variables are staged by FIPS code and joined to counties on the
+    # server, so no FIPS to county_id mapping is fetched. Parsing is CPU bound
+    # and every file is independent, so the files are parsed in worker processes
+    # and each is COPYed as soon as it is ready.
+    variables = ",\n            ".join(f"{c} FLOAT" for c in CLIMATE_COLUMNS[2:])
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE stage_climate_variables (
+            fips VARCHAR(5),
+            gwl NUMERIC(2,1),
+            {variables}
+        ) ON COMMIT DROP
+    """
+    )
 
-        climate_data: List[Tuple] = [
-            (
-                fips_to_id[props["FIPS"]],
+    # Counties come from the first file, unless an earlier run already loaded
+    # them. They are read in the same pass as its climate variables.
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM counties)")
+    load_counties = not cursor.fetchone()[0]
+    first_file = next(iter(gwl_files))
+
+    with ProcessPoolExecutor(
+        max_workers=min(os.cpu_count() or 1, len(gwl_files))
+    ) as executor:
+        futures = [
+            executor.submit(
+                parse_gwl_file,
+                gwl_file,
                 gwl_value,
-                props.get(f"pr_above_nonzero_99th_GWL{int(gwl_value)}"),
-                props.get(f"prmax1day_GWL{int(gwl_value)}"),
-                props.get(f"prmax5yr_GWL{int(gwl_value)}"),
-                props.get(f"tavg_GWL{int(gwl_value)}"),
-                props.get(f"tmax1day_GWL{int(gwl_value)}"),
-                props.get(f"tmax_days_ge_100f_GWL{int(gwl_value)}"),
-                props.get(f"tmax_days_ge_105f_GWL{int(gwl_value)}"),
-                props.get(f"tmax_days_ge_95f_GWL{int(gwl_value)}"),
-                props.get(f"tmean_jja_GWL{int(gwl_value)}"),
-                props.get(f"tmin_days_ge_70f_GWL{int(gwl_value)}"),
-                props.get(f"tmin_days_le_0f_GWL{int(gwl_value)}"),
-                props.get(f"tmin_days_le_32f_GWL{int(gwl_value)}"),
-                props.get(f"tmin_jja_GWL{int(gwl_value)}"),
-                props.get(f"pr_annual_GWL{int(gwl_value)}"),
-                props.get(f"pr_days_above_nonzero_99th_GWL{int(gwl_value)}"),
+                counties=load_counties and gwl_file == first_file,
             )
-            for feature in data["features"]
-            if (props := feature["properties"])
+            for gwl_file, gwl_value in gwl_files.items()
         ]
+        for future in as_completed(futures):
+            climate_data, counties_data = future.result()
+            if counties_data:
+                copy_text(cursor, "counties", COUNTY_COLUMNS, counties_data)
+            copy_text(cursor, "stage_climate_variables", STAGE_COLUMNS, climate_data)
+
+    # One hash join against counties replaces a lookup per row. Rows from an
+    # earlier run are replaced, so the files can be reloaded.
+    columns = ", ".join(CLIMATE_COLUMNS)
+    staged = ", ".join(f"s.{c}" for c in STAGE_COLUMNS[1:])
+    updates = ",\n            ".join(f"{c} = EXCLUDED.{c}" for c in CLIMATE_COLUMNS[2:])
+    cursor.execute(
+        f"""
+        INSERT INTO climate_variables ({columns})
+        SELECT c.id, {staged}
+        FROM stage_climate_variables s
+        JOIN counties c USING (fips)
+        ON CONFLICT (county_id, gwl) DO UPDATE SET
+            {updates}
+    """
+    )
 
-        execute_values(
-            cursor,
-            """
-            INSERT INTO climate_variables (
-                county_id, gwl,
-                pr_above_nonzero_99th, prmax1day, prmax5yr,
-                tavg, tmax1day,
-                tmax_days_ge_100f, tmax_days_ge_105f, tmax_days_ge_95f,
-                tmean_jja,
-                tmin_days_ge_70f, tmin_days_le_0f, tmin_days_le_32f,
-                tmin_jja, pr_annual, pr_days_above_nonzero_99th
-            )
-            VALUES %s
-        """,
-            climate_data,
-        )
+    # Absolute climate variables are derived from the rows loaded above. On a
+    # database initialized before the view existed, seed_normals.py creates it
+    # (it also needs climate_normals), so only refresh it if it is there.
+    cursor.execute("SELECT to_regclass('climate_variables_absolute') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        cursor.execute("REFRESH MATERIALIZED VIEW climate_variables_absolute")
+    else:
+        print("climate_variables_absolute not found; run seed_normals.py to create it")
 
     connection.commit()
     cursor.close()
@@ -136,7 +218,7 @@ def main() -> None:
         "--files",
         nargs="+",
         metavar=("FILE GWL"),
-        help="GeoJSON files and their corresponding GWL values (e.g., file1.json 1.5 file2.json 2.0)",
+        help="GeoJSON files (optionally .gz or .zst compressed) and their corresponding GWL values (e.g., file1.json 1.5 file2.json 2.0)",
     )
     parser.add_argument("--host", default="localhost", help="Database host")
     parser.add_argument("--dbname", default="climate_data", help="Database name")
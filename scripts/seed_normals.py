@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import csv
+import io
+import orjson
+from pathlib import Path
 import psycopg2
 
 
@@ -22,40 +25,65 @@ def create_table(cur):
     cur.execute(create_table_query)
 
 
-def insert_data(cur, record):
-    # Insert record into the table.
-    # This query uses the ON CONFLICT clause to perform an upsert (update if the county_fips exists).
-    insert_query = """
-    INSERT INTO climate_normals (
-        county_fips, tavg, tmax_days_ge_100f, tmean_jja,
-        tmin_days_ge_70f, tmin_days_le_0f, tmin_days_le_32f,
-        tmin_jja, pr_annual
+# Idempotent definition of the view, also run by database/init-db.sql. It sits in
+# ../database/ relative to this script both in the repository and the ar-db image.
+DATABASE_DIR = Path(__file__).resolve().parents[1] / "database"
+ABSOLUTE_VIEW_SQL = DATABASE_DIR / "climate_variables_absolute.sql"
+
+
+def create_absolute_view(cur):
+    # Create the view of absolute climate variables if it doesn't exist, so
+    # databases initialized before it was added to init-db.sql can be seeded.
+    cur.execute(ABSOLUTE_VIEW_SQL.read_text())
+
+
+# Columns of climate_normals, in the order the JSON record keys map onto them
+NORMALS_COLUMNS = [
+    "county_fips",
+    "tavg",
+    "tmax_days_ge_100f",
+    "tmean_jja",
+    "tmin_days_ge_70f",
+    "tmin_days_le_0f",
+    "tmin_days_le_32f",
+    "tmin_jja",
+    "pr_annual",
+]
+
+
+def insert_data(cur, records):
+    # Stream every record into a temporary table with COPY, which skips parsing
+    # an INSERT per row, then upsert them all with one statement (update the row
+    # if the county_fips exists).
+    cur.execute("""
+    CREATE TEMP TABLE tmp_climate_normals
+        (LIKE climate_normals INCLUDING DEFAULTS) ON COMMIT DROP;
+    """)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for record in records:
+        writer.writerow(
+            # county_id gets converted to county_fips for specificity
+            [record["county_id"]]
+            + [record[col] for col in NORMALS_COLUMNS[1:]]
+        )
+    buf.seek(0)
+    # Unquoted empty fields, written for None, are NULL in CSV format
+    columns = ", ".join(NORMALS_COLUMNS)
+    cur.copy_expert(
+        f"COPY tmp_climate_normals ({columns}) FROM STDIN WITH (FORMAT csv)", buf
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON CONFLICT (county_fips) DO UPDATE SET
-        tavg = EXCLUDED.tavg,
-        tmax_days_ge_100f = EXCLUDED.tmax_days_ge_100f,
-        tmean_jja = EXCLUDED.tmean_jja,
-        tmin_days_ge_70f = EXCLUDED.tmin_days_ge_70f,
-        tmin_days_le_0f = EXCLUDED.tmin_days_le_0f,
-        tmin_days_le_32f = EXCLUDED.tmin_days_le_32f,
-        tmin_jja = EXCLUDED.tmin_jja,
-        pr_annual = EXCLUDED.pr_annual;
-    """
-    cur.execute(
-        insert_query,
-        (
-            record["county_id"],  # gets converted to county_fips for specificity
-            record["tavg"],
-            record["tmax_days_ge_100f"],
-            record["tmean_jja"],
-            record["tmin_days_ge_70f"],
-            record["tmin_days_le_0f"],
-            record["tmin_days_le_32f"],
-            record["tmin_jja"],
-            record["pr_annual"],
-        ),
+
+    updates = ",\n        ".join(
+        f"{col} = EXCLUDED.{col}" for col in NORMALS_COLUMNS[1:]
     )
+    cur.execute(f"""
+    INSERT INTO climate_normals ({columns})
+    SELECT {columns} FROM tmp_climate_normals
+    ON CONFLICT (county_fips) DO UPDATE SET
+        {updates};
+    """)
 
 
 def main():
@@ -87,15 +115,21 @@ def main():
         conn = psycopg2.connect(**conn_params)
         cur = conn.cursor()
 
+        # Load everything in one transaction, and don't wait for its WAL to be
+        # flushed: a crash just means seeding again.
+        cur.execute("SET LOCAL synchronous_commit = off")
+
         create_table(cur)
-        conn.commit()
+        create_absolute_view(cur)
+
+        with open(args.file, "rb") as f:
+            data = orjson.loads(f.read())
 
-        with open(args.file, "r") as f:
-            data = json.load(f)
+        # Insert every record.
+        insert_data(cur, data)
 
-        # Insert each record.
-        for record in data:
-            insert_data(cur, record)
+        # Absolute climate variables are derived from the normals
+        cur.execute("REFRESH MATERIALIZED VIEW climate_variables_absolute")
 
         # Commit changes and close connection.
         conn.commit()
@@ -105,6 +139,7 @@ def main():
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        raise
 
 
 if __name__ == "__main__":